@@ -1,19 +1,48 @@
 from __future__ import annotations
 import argparse
+import atexit
 from ast import List
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import copy
 from datetime import datetime
 from enum import Enum
 from dataclasses import dataclass, field
-from time import sleep
-from typing import Tuple, TypeVar, Type, Iterable, ClassVar, Union
+from time import sleep, monotonic
+from typing import Tuple, TypeVar, Type, Iterable, ClassVar
+import os
 import random
+import sys
 import requests
 
 # maximum and minimum values for our heuristic scores (usually represents an end of game condition)
 MAX_HEURISTIC_SCORE = 2000000000
 MIN_HEURISTIC_SCORE = -2000000000
 
+# text labels of board rows and columns
+_ROW_LABELS = tuple("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+_COL_LABELS = tuple("0123456789abcdef")
+# label -> index lookups for parsing, accepting either case
+_ROW_IDX = {c: i for (i, c) in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZ")} | \
+           {c: i for (i, c) in enumerate("abcdefghijklmnopqrstuvwxyz")}
+_COL_IDX = {c: i for (i, c) in enumerate("0123456789abcdef")} | {c: i for (i, c) in enumerate("0123456789ABCDEF")}
+# separators dropped from coordinates typed by the user
+_STRIP_TABLE = str.maketrans("", "", " ,.:;-_")
+
+# fixed seed so that Zobrist hashes are the same from one run to the next
+_zobrist_rng = random.Random(472)
+
+# half-width of the aspiration window around the previous iteration's score in iterative deepening
+ASPIRATION_WINDOW = 50
+# number of searched nodes between two reads of the clock against the search deadline
+TIME_CHECK_NODES = 1024
+# share of max_time the search may use, the rest is left for making and printing the move
+TIME_BUDGET_SHARE = 0.95
+
+# transposition table entry flags: the stored score is exact, a lower bound or an upper bound
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
 
 class UnitType(Enum):
     """Every unit type."""
@@ -37,6 +66,16 @@ class Player(Enum):
             return Player.Attacker
 
 
+# Game._terminal values once the game is over: 1 + value of the winning Player
+_ATTACKER_WON = 1 + Player.Attacker.value
+_DEFENDER_WON = 1 + Player.Defender.value
+# winner by Game._terminal value
+_WINNERS = (None, Player.Attacker, Player.Defender)
+# Game._terminal by [max turns reached][attacker has AI][defender has AI]
+_TERMINAL = (((_DEFENDER_WON, _DEFENDER_WON), (_ATTACKER_WON, 0)),
+             ((_DEFENDER_WON, _DEFENDER_WON), (_DEFENDER_WON, _DEFENDER_WON)))
+
+
 class GameType(Enum):
     AttackerVsDefender = 0
     AttackerVsComp = 1
@@ -74,11 +113,7 @@ class Unit:
 
     def mod_health(self, health_delta: int):
         """Modify this unit's health by delta amount."""
-        self.health += health_delta
-        if self.health < 0:
-            self.health = 0
-        elif self.health > 9:
-            self.health = 9
+        self.health = max(0, min(9, self.health + health_delta))
 
     def to_string(self) -> str:
         """Text representation of this unit."""
@@ -92,17 +127,60 @@ class Unit:
 
     def damage_amount(self, target: Unit) -> int:
         """How much can this unit damage another unit."""
-        amount = self.damage_table[self.type.value][target.type.value]
-        if target.health - amount < 0:
-            return target.health
-        return amount
+        return min(target.health, DAMAGE_TABLE[self.type.value * 5 + target.type.value])
 
     def repair_amount(self, target: Unit) -> int:
         """How much can this unit repair another unit."""
-        amount = self.repair_table[self.type.value][target.type.value]
-        if target.health + amount > 9:
-            return 9 - target.health
-        return amount
+        return min(9 - target.health, REPAIR_TABLE[self.type.value * 5 + target.type.value])
+
+
+# damage and repair tables flattened into tuples, indexed by source type * 5 + target type
+DAMAGE_TABLE = tuple(amount for row in Unit.damage_table for amount in row)
+REPAIR_TABLE = tuple(amount for row in Unit.repair_table for amount in row)
+
+# values of the unit types free to move in all directions, even while engaged in combat (virus and tech),
+# as plain ints since Enum.value is a property lookup
+FREE_MOVERS = (UnitType.Tech.value, UnitType.Virus.value)
+
+# (row, col) offsets of the cells a unit may move to or act on, indexed by unit type then player (self-destruct aside):
+# virus and tech go in all directions, the other attacker units up or left and the other defender units down or right
+ADJACENT_DELTAS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+MOVE_DELTAS = tuple(
+    (ADJACENT_DELTAS, ADJACENT_DELTAS) if unit_type.value in FREE_MOVERS else
+    (((-1, 0), (0, -1)), ((1, 0), (0, 1)))
+    for unit_type in UnitType
+)
+
+
+def heuristic_table(weights: list[int], by_health: bool = False) -> list[int]:
+    """Value of every possible board byte given a weight per unit type (scaled by health if by_health).
+
+    Attacker units count positively and defender units negatively, empty cells count 0.
+    """
+    table = [0] * 256
+    for player in Player:
+        sign = 1 if player == Player.Attacker else -1
+        for unit_type in UnitType:
+            for health in range(16):
+                byte = (player.value << 7) | ((unit_type.value + 1) << 4) | health
+                table[byte] = sign * weights[unit_type.value] * (health if by_health else 1)
+    return table
+
+
+def cell_text_table() -> list[str]:
+    """Text of every possible board byte as drawn in a board cell, " .  " for an empty cell."""
+    table = [" .  "] * 256
+    for player in Player:
+        for unit_type in UnitType:
+            for health in range(16):
+                byte = (player.value << 7) | ((unit_type.value + 1) << 4) | health
+                table[byte] = f"{Unit(player=player, type=unit_type, health=health).to_string():^3} "
+    return table
+
+
+# unit type of every board byte, -1 for an empty cell
+_BYTE_TYPE = tuple(((byte >> 4) & 0x7) - 1 if byte != 0 else -1 for byte in range(256))
+_CELL_TEXT = tuple(cell_text_table())
 
 
 ##############################################################################################################
@@ -115,21 +193,17 @@ class Coord:
 
     def col_string(self) -> str:
         """Text representation of this Coord's column."""
-        coord_char = '?'
-        if self.col < 16:
-            coord_char = "0123456789abcdef"[self.col]
-        return str(coord_char)
+        return _COL_LABELS[self.col] if 0 <= self.col < 16 else '?'
 
     def row_string(self) -> str:
         """Text representation of this Coord's row."""
-        coord_char = '?'
-        if self.row < 26:
-            coord_char = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"[self.row]
-        return str(coord_char)
+        return _ROW_LABELS[self.row] if 0 <= self.row < 26 else '?'
 
     def to_string(self) -> str:
         """Text representation of this Coord."""
-        return self.row_string() + self.col_string()
+        row = _ROW_LABELS[self.row] if 0 <= self.row < 26 else '?'
+        col = _COL_LABELS[self.col] if 0 <= self.col < 16 else '?'
+        return f"{row}{col}"
 
     def __str__(self) -> str:
         """Text representation of this Coord."""
@@ -141,27 +215,35 @@ class Coord:
 
     def iter_range(self, dist: int) -> Iterable[Coord]:
         """Iterates over Coords inside a rectangle centered on our Coord."""
+        for (row, col) in self.iter_range_idx(dist):
+            yield Coord(row, col)
+
+    def iter_range_idx(self, dist: int) -> Iterable[Tuple[int, int]]:
+        """Iterates over (row, col) tuples inside a rectangle centered on our Coord."""
         for row in range(self.row - dist, self.row + 1 + dist):
             for col in range(self.col - dist, self.col + 1 + dist):
-                yield Coord(row, col)
+                yield (row, col)
 
     def iter_adjacent(self) -> Iterable[Coord]:
         """Iterates over adjacent Coords."""
-        yield Coord(self.row - 1, self.col)
-        yield Coord(self.row, self.col - 1)
-        yield Coord(self.row + 1, self.col)
-        yield Coord(self.row, self.col + 1)
+        for (row, col) in self.iter_adjacent_idx():
+            yield Coord(row, col)
+
+    def iter_adjacent_idx(self) -> Iterable[Tuple[int, int]]:
+        """Iterates over adjacent (row, col) tuples."""
+        yield (self.row - 1, self.col)
+        yield (self.row, self.col - 1)
+        yield (self.row + 1, self.col)
+        yield (self.row, self.col + 1)
 
     @classmethod
     def from_string(cls, s: str) -> Coord | None:
         """Create a Coord from a string. ex: D2."""
-        s = s.strip()
-        for sep in " ,.:;-_":
-            s = s.replace(sep, "")
+        s = s.strip().translate(_STRIP_TABLE)
         if (len(s) == 2):
             coord = Coord()
-            coord.row = "ABCDEFGHIJKLMNOPQRSTUVWXYZ".find(s[0:1].upper())
-            coord.col = "0123456789abcdef".find(s[1:2].lower())
+            coord.row = _ROW_IDX.get(s[0], -1)
+            coord.col = _COL_IDX.get(s[1], -1)
             return coord
         else:
             return None
@@ -206,15 +288,13 @@ class CoordPair:
     @classmethod
     def from_string(cls, s: str) -> CoordPair | None:
         """Create a CoordPair from a string. ex: A3 B2"""
-        s = s.strip()
-        for sep in " ,.:;-_":
-            s = s.replace(sep, "")
+        s = s.strip().translate(_STRIP_TABLE)
         if (len(s) == 4):
             coords = CoordPair()
-            coords.src.row = "ABCDEFGHIJKLMNOPQRSTUVWXYZ".find(s[0:1].upper())
-            coords.src.col = "0123456789abcdef".find(s[1:2].lower())
-            coords.dst.row = "ABCDEFGHIJKLMNOPQRSTUVWXYZ".find(s[2:3].upper())
-            coords.dst.col = "0123456789abcdef".find(s[3:4].lower())
+            coords.src.row = _ROW_IDX.get(s[0], -1)
+            coords.src.col = _COL_IDX.get(s[1], -1)
+            coords.dst.row = _ROW_IDX.get(s[2], -1)
+            coords.dst.col = _COL_IDX.get(s[3], -1)
             return coords
         else:
             return None
@@ -235,6 +315,9 @@ class Options:
     randomize_moves: bool = True
     broker: str | None = None
     heuristic: int | None = 0
+    tt_size: int = 1000000
+    parallel: bool = False
+    debug: bool = False
 
 
 ##############################################################################################################
@@ -242,28 +325,93 @@ class Options:
 @dataclass(slots=True)
 class Stats:
     """Representation of the global game statistics."""
-    evaluations_per_depth: dict[int, int] = field(default_factory=dict)
+    evaluations_per_depth: dict[int, int] = field(default_factory=dict)  # moves searched, by ply from the root
+    leaf_evaluations: int = 0  # moves searched whose position was scored at the search depth limit
     total_seconds: float = 0.0
 
 
+##############################################################################################################
+
+@dataclass(slots=True)
+class UndoRecord:
+    """Board cells and flags overwritten by Game.do_move, so that Game.undo_move can restore them."""
+    src: int = 0
+    dst: int = 0
+    src_byte: int = 0
+    dst_byte: int = 0
+    neighbors: list[tuple[int, int]] = field(default_factory=list)  # (index, byte) of cells hit by a self-destruct
+    atk_ai: bool = True
+    def_ai: bool = True
+    terminal: int = 0
+    hash: int = 0
+    atk_bb: int = 0
+    def_bb: int = 0
+
+
+class SearchTimeout(Exception):
+    """Raised by Game.alphabeta when the search goes past its deadline."""
+
+
 ##############################################################################################################
 
 @dataclass(slots=True)
 class Game:
-    """Representation of the game state."""
-    board: list[list[Unit | None]] = field(default_factory=list)
+    """Representation of the game state.
+
+    The board is a flat bytearray of dim*dim cells, one byte per cell (see _encode for the layout).
+    """
+    board: bytearray = field(default_factory=bytearray)
     next_player: Player = Player.Attacker
     turns_played: int = 0
     options: Options = field(default_factory=Options)
     stats: Stats = field(default_factory=Stats)
     _attacker_has_ai: bool = True
     _defender_has_ai: bool = True
+    _terminal: int = 0  # 0 while the game goes on, else 1 + value of the winning Player (see _update_terminal)
     game_trace: List[str] = field(default_factory=list)  # New attribute to store game events
+    hash: int = 0  # Zobrist hash of the board and next player, kept up to date by _put and next_turn
+    _tt: dict[int, tuple] = field(default_factory=dict)  # transposition table: hash -> (depth, score, flag, best move)
+    _killers: list[list[int | None]] = field(default_factory=list)  # 2 killer moves per ply from the search root
+    _history: list[list[int]] = field(default_factory=list)  # cutoff score of each move, per player (see add_killer)
+    _history_max: int = 0  # highest score in _history
+    _records: list[UndoRecord] = field(default_factory=list)  # undo record reused by alphabeta at each search depth
+    _bb: list[int] = field(default_factory=lambda: [0, 0])  # bitboards of occupied cells, indexed by player value
+    _masks: tuple = ()  # movement bitmasks for the board dim, see movement_masks
+    _dim: int = 5  # options.dim, read once in __post_init__
+    _http: requests.Session | None = None  # kept-alive connection to the game broker, if any
+    _pool: ProcessPoolExecutor | None = None  # worker processes of the parallel search, once started
+    _deadline: float | None = None  # monotonic() time after which alphabeta raises SearchTimeout
+    _nodes_to_check: int = TIME_CHECK_NODES  # nodes left before alphabeta next reads the clock
+    _str_cache: str | None = None  # last to_string result, reset to None whenever the board or turn changes
+    _trace_written: bool = False  # set once write_game_trace_to_file has written the trace
+    # class variable: Zobrist keys, one random 64-bit key per (cell index, cell byte), the empty byte hashing to 0
+    zobrist_table: ClassVar[list[list[int]]] = [
+        [0] + [_zobrist_rng.getrandbits(64) for _ in range(255)] for _ in range(16 * 16)
+    ]
+    # class variable: Zobrist key xored in while the defender is the next player
+    zobrist_side: ClassVar[int] = _zobrist_rng.getrandbits(64)
+    # class variable: value of every board byte for heuristics e0, e1 and e2 (positive for the attacker's units)
+    heuristic_tables: ClassVar[list[list[int]]] = [
+        heuristic_table([9999, 3, 3, 3, 3]),
+        heuristic_table([9999, 1, 9, 3, 1]),
+        heuristic_table([9999, 1, 9, 3, 1], by_health=True),
+    ]
+    # class variable: unit values used to order attacks in ordered_moves (based on the unit type constants in order)
+    unit_values: ClassVar[list[int]] = [50, 6, 9, 3, 1]
+    # class variable: movement bitmasks already computed, by board dim
+    mask_cache: ClassVar[dict[int, tuple]] = {}
 
     def __post_init__(self):
         """Automatically called after class init to set up the default board state."""
-        dim = self.options.dim
-        self.board = [[None for _ in range(dim)] for _ in range(dim)]
+        dim = self._dim = self.options.dim
+        self.board = bytearray(dim * dim)
+        self.hash = self.zobrist_side if self.next_player == Player.Defender else 0
+        self._bb = [0, 0]
+        self._masks = self.movement_masks(dim)
+        self._update_terminal()
+        if self.options.broker is not None:
+            self._http = requests.Session()
+            self._http.headers.update({'Accept': 'application/json'})
         md = dim - 1
         self.set(Coord(0, 0), Unit(player=Player.Defender, type=UnitType.AI))
         self.set(Coord(1, 0), Unit(player=Player.Defender, type=UnitType.Tech))
@@ -290,50 +438,139 @@ class Game:
 
         self.game_trace.append(f"player 1: {player1type} & player 2: {player2type}")
         self.game_trace.append(f"heuristic: {self.options.heuristic}")
+
     def clone(self) -> Game:
         """Make a new copy of a game for minimax recursion.
 
-        Shallow copy of everything except the board (options and stats are shared).
+        Shallow copy of everything except the board and the search's scratch state: options, stats, the
+        transposition table and the game trace are shared, while the killer moves and history scores are copied
+        and the undo records are left for the copy's own search to allocate.
         """
         new = copy.copy(self)
-        new.board = copy.deepcopy(self.board)
+        new.board = bytearray(self.board)
+        new._bb = self._bb.copy()
+        new._killers = [killers.copy() for killers in self._killers]
+        new._history = [history.copy() for history in self._history]
+        new._records = []
         return new
 
+    def set_position(self, board: bytes, next_player: Player, turns_played: int):
+        """Replace the board and turn, recomputing the hash, bitboards, AI flags and outcome from them."""
+        self.next_player = next_player
+        self.turns_played = turns_played
+        self.board = bytearray(len(board))
+        self.hash = self.zobrist_side if next_player == Player.Defender else 0
+        self._bb = [0, 0]
+        self._attacker_has_ai = False
+        self._defender_has_ai = False
+        for (idx, byte) in enumerate(board):
+            if byte != 0:
+                self._put(idx, byte)
+                if _BYTE_TYPE[byte] == UnitType.AI.value:
+                    if byte >> 7 == Player.Attacker.value:
+                        self._attacker_has_ai = True
+                    else:
+                        self._defender_has_ai = True
+        self._update_terminal()
+        self._str_cache = None
+
+    @classmethod
+    def movement_masks(cls, dim: int) -> tuple[list[list[list[int]]], list[int]]:
+        """Bitmasks of the cells each unit type and player may target from each cell, and of each cell's neighbors.
+
+        Bit i stands for cell index i (row * dim + col). Self-destruct (src == dst) is not part of the masks.
+        """
+        masks = cls.mask_cache.get(dim)
+        if masks is None:
+            def mask(idx: int, deltas: Iterable[Tuple[int, int]]) -> int:
+                (row, col) = divmod(idx, dim)
+                return sum(1 << ((row + dr) * dim + col + dc) for (dr, dc) in deltas
+                           if 0 <= row + dr < dim and 0 <= col + dc < dim)
+
+            move_masks = [[[mask(idx, deltas) for idx in range(dim * dim)] for deltas in by_player]
+                          for by_player in MOVE_DELTAS]
+            adjacent_masks = [mask(idx, ADJACENT_DELTAS) for idx in range(dim * dim)]
+            masks = cls.mask_cache[dim] = (move_masks, adjacent_masks)
+        return masks
+
+    @staticmethod
+    def _encode(unit: Unit | None) -> int:
+        """Pack a unit into a board byte: (player << 7) | ((type + 1) << 4) | health, 0 for an empty cell."""
+        if unit is None:
+            return 0
+        return (unit.player.value << 7) | ((unit.type.value + 1) << 4) | unit.health
+
+    @staticmethod
+    def _decode(byte: int) -> Unit | None:
+        """Unpack a board byte into a new Unit (None for an empty cell)."""
+        if byte == 0:
+            return None
+        return Unit(player=Player(byte >> 7), type=UnitType(((byte >> 4) & 0x7) - 1), health=byte & 0xF)
+
     def is_empty(self, coord: Coord) -> bool:
         """Check if contents of a board cell of the game at Coord is empty (must be valid coord)."""
-        return self.board[coord.row][coord.col] is None
+        return self.board[coord.row * self._dim + coord.col] == 0
 
     def get(self, coord: Coord) -> Unit | None:
-        """Get contents of a board cell of the game at Coord."""
+        """Get contents of a board cell of the game at Coord.
+
+        The returned Unit is a decoded copy: changes to it must be written back with set().
+        """
         if self.is_valid_coord(coord):
-            return self.board[coord.row][coord.col]
+            return self._decode(self.board[coord.row * self._dim + coord.col])
         else:
             return None
 
     def set(self, coord: Coord, unit: Unit | None):
         """Set contents of a board cell of the game at Coord."""
         if self.is_valid_coord(coord):
-            self.board[coord.row][coord.col] = unit
+            self._put(coord.row * self._dim + coord.col, self._encode(unit))
+
+    def _put(self, idx: int, byte: int):
+        """Write a byte to a board cell, keeping the Zobrist hash in sync."""
+        old = self.board[idx]
+        keys = self.zobrist_table[idx]
+        self.hash ^= keys[old] ^ keys[byte]
+        bit = 1 << idx
+        if old != 0:
+            self._bb[old >> 7] &= ~bit
+        if byte != 0:
+            self._bb[byte >> 7] |= bit
+        self.board[idx] = byte
+        self._str_cache = None
 
     def remove_dead(self, coord: Coord):
         """Remove unit at Coord if dead."""
         unit = self.get(coord)
 
         if unit is not None and not unit.is_alive():
-            self.set(coord, None)
-            if unit.type == UnitType.AI:
-                if unit.player == Player.Attacker:
-                    self._attacker_has_ai = False
-                else:
-                    self._defender_has_ai = False
-
+            self._remove_at(coord.row * self._dim + coord.col)
+
+    def _remove_at(self, idx: int):
+        """Remove the unit at a cell index, updating the AI flags and game outcome if it is an AI."""
+        byte = self.board[idx]
+        self._put(idx, 0)
+        if (byte >> 4) & 0x7 == UnitType.AI.value + 1:
+            if byte >> 7 == Player.Attacker.value:
+                self._attacker_has_ai = False
+            else:
+                self._defender_has_ai = False
+            self._update_terminal()
 
     def mod_health(self, coord: Coord, health_delta: int):
         """Modify health of unit at Coord (positive or negative delta)."""
-        target = self.get(coord)
-        if target is not None:
-            target.mod_health(health_delta)
-            self.remove_dead(coord)
+        if self.is_valid_coord(coord):
+            self._mod_health_at(coord.row * self._dim + coord.col, health_delta)
+
+    def _mod_health_at(self, idx: int, health_delta: int):
+        """Modify health of the unit at a cell index on its board byte (health is the low 4 bits)."""
+        byte = self.board[idx]
+        if byte != 0:
+            health = max(0, min(9, (byte & 0xF) + health_delta))
+            if health == 0:
+                self._remove_at(idx)
+            else:
+                self._put(idx, (byte & 0xF0) | health)
 
     def is_valid_move(self, mv: CoordPair) -> bool:
         dst = mv.dst
@@ -342,197 +579,182 @@ class Game:
         if not self.is_valid_coord(src) or not self.is_valid_coord(dst):
             return False
 
-        unit = self.get(src)
+        dim = self._dim
+        src_idx = src.row * dim + src.col
+        byte = self.board[src_idx]
         # If there is no friendly unit on the source square, move is not valid
-        if unit is None or unit.player != self.next_player:
-            return False
-
-        isValid = (
-                self.is_dst_valid_square(unit, src, dst) and  # Is the destination square a valid square to move to
-                self.is_moving_unit_allowed_to_move(unit, src, dst) and # Is the unit allowed to move to the destination square
-                self.can_dst_unit_be_targeted(unit, dst)  # Can the unit on the destination square be targeted
-        )
-
-        return isValid
-
-    def is_dst_valid_square(self, unit: Unit, src: Coord, dst: Coord) -> bool:
-        if self.is_unit_tech_or_virus(unit):  # Virus and tech can move in all directions
-            return (
-                    src.row == dst.row + 1 and src.col == dst.col or
-                    dst.col == src.col + 1 or src.row == dst.row or
-                    src.row + 1 == dst.row and src.col == dst.col or
-                    dst.col == src.col + 1 and src.row == dst.row
-            )
-
-        player = unit.player
-        if player == Player.Attacker:
-            if src.row == dst.row and src.col == dst.col:  # If self destruct, valid move.
-                return True
-            # If source is an attacker, then it can only move up or left
-            if (src.row == dst.row + 1 and src.col == dst.col) or \
-                    (src.col == dst.col + 1 and src.row == dst.row):
-                return True
+        if byte == 0 or byte >> 7 != self.next_player.value:
             return False
-        else:
-            if src.row == dst.row and src.col == dst.col:  # If self destruct, valid move.
-                return True
-            # If source is a defender, then it can only move down or right
-            if (src.row + 1 == dst.row and src.col == dst.col) or \
-                    (dst.col == src.col + 1 and src.row == dst.row):
-                return True
-        return False
-
-    def is_moving_unit_allowed_to_move(self, unit: Unit, src: Coord, dst: Coord) -> bool:
-        if self.is_unit_tech_or_virus(unit):  # Tech or virus can't be engaged in combat
-            return True
-
-        adjacent_units: List[Union[Unit, None]] = self.get_adjacent_units(src, dst)
 
-        for au in adjacent_units:
-            if au is not None and au.player != unit.player:
-                return False
+        return self.is_legal_move(src_idx, dst.row * dim + dst.col)
 
-        return True
-
-    def can_dst_unit_be_targeted(self, unit: Unit, dst: Coord) -> bool:
-        src_unit = self.get(dst)
-        if src_unit and src_unit.player == unit.player and src_unit.type == unit.type:
-            return True  # Allow self-destruct actions
+    def is_legal_move(self, src: int, dst: int) -> bool:
+        """Check a move between two cell indices for the unit on src, using the movement bitmasks."""
+        if src == dst:  # Any unit can self-destruct, even when engaged in combat
+            return True
 
-        target_unit: Unit = self.board[dst.row][dst.col]
-        if target_unit is None:
-            return True  # No unit, no repair, move is valid
+        byte = self.board[src]
+        player = byte >> 7
+        unit_type = _BYTE_TYPE[byte]
+        dst_bit = 1 << dst
+        (move_masks, adjacent_masks) = self._masks
 
-        if unit.player != target_unit.player:
-            return True  # can always attack if target unit is opponent
-        if target_unit.health == 9:  # max health doesn't allow repairing
+        # Is the destination square one the unit type is allowed to reach from src
+        if not move_masks[unit_type][player][src] & dst_bit:
             return False
 
-        return unit.repair_amount(target_unit) > 0  # Move is valid if unit is allowed to repair target
-
-    def is_unit_tech_or_virus(self, unit: Unit) -> bool:
-        return unit.type == UnitType.Virus or unit.type == UnitType.Tech
-
-    def get_adjacent_units(self, src: Coord, dst: Coord) -> List(Unit | None):
-        topCoord = Coord(src.row - 1, src.col)
-        bottomCoord = Coord(src.row + 1, src.col)
-        rightCoord = Coord(src.row, src.col + 1)
-        leftCoord = Coord(src.row, src.col - 1)
+        # AI, Firewall and Program can't move while engaged in combat (with a unit other than their target)
+        if unit_type not in FREE_MOVERS and adjacent_masks[src] & ~dst_bit & self._bb[player ^ 1]:
+            return False
 
-        top = self.board[src.row - 1][src.col] if self.is_valid_coord(topCoord) and topCoord != dst else None
-        bottom = self.board[src.row + 1][src.col] if self.is_valid_coord(bottomCoord) and bottomCoord != dst else None
-        right = self.board[src.row][src.col + 1] if self.is_valid_coord(rightCoord) and rightCoord != dst else None
-        left = self.board[src.row][src.col - 1] if self.is_valid_coord(leftCoord) and leftCoord != dst else None
+        # A friendly target must be repairable: not at full health, and the repair table allows it
+        if self._bb[player] & dst_bit:
+            target = self.board[dst]
+            return (target & 0xF) < 9 and REPAIR_TABLE[unit_type * 5 + _BYTE_TYPE[target]] > 0
 
-        return [left, right, bottom, top]
+        return True
 
     def apply_self_destruct_damage(self, coords):
-        # Get the self-destruct damage from the moving unit
-        moving_unit = self.get(coords.src)
-        self_destruct_damage = moving_unit.health
-
-        # Get the coordinates for all the pieces surrounding the moving unit
-        x, y = coords.src.row, coords.src.col
-        adjacent_coords = [
-            (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1),
-            (x - 1, y - 1), (x - 1, y + 1), (x + 1, y - 1), (x + 1, y + 1)
-        ]
-
-        # Reduce the health of surrounding units by 2
-        for i, j in adjacent_coords:
-            if self.is_valid_coord(Coord(i, j)):
-                target_unit = self.board[i][j]
-                if target_unit:
-                    target_unit.mod_health(-2)
-                    if not target_unit.is_alive():
-                        self.set(Coord(i, j), None)
+        # Reduce the health of all the units surrounding the moving unit by 2
+        dim = self._dim
+        for (row, col) in coords.src.iter_range_idx(1):
+            if 0 <= row < dim and 0 <= col < dim and (row != coords.src.row or col != coords.src.col):
+                self._mod_health_at(row * dim + col, -2)
 
         # Remove the self-destructing unit from the board
-        moving_unit.mod_health(-moving_unit.health)
-        self.remove_dead(coords.src)
+        self._remove_at(coords.src.row * dim + coords.src.col)
 
     def perform_move(self, coords: CoordPair) -> Tuple[bool, str]:
-        # Record the action at the start
+        if self.is_valid_move(coords):
+            self._apply(coords, UndoRecord())
+            return True, ""
 
+        else:
+            return False, "invalid move"
 
-        if self.is_valid_move(coords):
-            moving_unit = self.get(coords.src)
-            target_unit = self.get(coords.dst)
-
-            print(f"Moving unit: {moving_unit}")  # Debug print
-            print(f"Target unit: {target_unit}")  # Debug print
-
-            # If the source and destination are the same (self-destruct)
-            if coords.src == coords.dst:
-                self.apply_self_destruct_damage(coords)
-            # If there's a unit at the destination
-            elif target_unit:
-                # If it's an opponent's unit, apply damage to both units
-                if target_unit.player != moving_unit.player:
-                    damage = moving_unit.damage_amount(target_unit)
-
-                    print(f"Calculated damage: {damage}")  # Debug print
-
-                    # Reduce health of the target unit
-                    print(f"Target unit health before: {target_unit.health}")  # Debug print
-                    self.mod_health(coords.dst, -damage)
-                    print(f"Target unit health after: {target_unit.health}")  # Debug print
-
-                    # Reduce health of the attacking unit
-                    print(f"Moving unit health before: {moving_unit.health}")  # Debug print
-                    self.mod_health(coords.src, -damage)
-                    print(f"Moving unit health after: {moving_unit.health}")  # Debug print
-
-                # If it's a friendly unit, repair if move is valid
-                else:
-                    repair = moving_unit.repair_amount(target_unit)
-                    print(f"Repair amount: {repair}")  # Debug print
-                    print(f"Target unit health before: {target_unit.health}")  # Debug print
-                    self.mod_health(coords.dst, +repair)
-                    print(f"Target unit health after: {target_unit.health}")  # Debug print
+    def do_move(self, move: int, record: UndoRecord | None = None) -> UndoRecord:
+        """Play a move from iter_moves in place and pass the turn, for tree search.
 
+        The undo information goes into record if given (overwriting it), else into a new UndoRecord.
+        """
+        if record is None:
+            record = UndoRecord()
+        else:
+            record.neighbors.clear()
+        self._apply(self.move_from_int(move), record)
+        self.next_turn()
+        return record
+
+    def undo_move(self, record: UndoRecord):
+        """Take back a move played with do_move."""
+        for idx, byte in record.neighbors:
+            self.board[idx] = byte
+        self.board[record.dst] = record.dst_byte
+        self.board[record.src] = record.src_byte
+        self._attacker_has_ai = record.atk_ai
+        self._defender_has_ai = record.def_ai
+        self._terminal = record.terminal
+        self.hash = record.hash
+        self._bb[0] = record.atk_bb
+        self._bb[1] = record.def_bb
+        self.next_player = self.next_player.next()
+        self.turns_played -= 1
+        self._str_cache = None
+
+    def _apply(self, coords: CoordPair, record: UndoRecord):
+        """Apply a move to the board, saving what it overwrites into record."""
+        _dbg = self.options.debug
+        dim = self._dim
+        record.src = coords.src.row * dim + coords.src.col
+        record.dst = coords.dst.row * dim + coords.dst.col
+        record.src_byte = self.board[record.src]
+        record.dst_byte = self.board[record.dst]
+        record.atk_ai = self._attacker_has_ai
+        record.def_ai = self._defender_has_ai
+        record.terminal = self._terminal
+        record.hash = self.hash
+        (record.atk_bb, record.def_bb) = self._bb
+
+        src_byte = record.src_byte
+        dst_byte = record.dst_byte
+
+        if _dbg:
+            print(f"Moving unit: {self._decode(src_byte)}")
+            print(f"Target unit: {self._decode(dst_byte)}")
+
+        # If the source and destination are the same (self-destruct)
+        if record.src == record.dst:
+            for (row, col) in coords.src.iter_range_idx(1):
+                if 0 <= row < dim and 0 <= col < dim and (row != coords.src.row or col != coords.src.col):
+                    idx = row * dim + col
+                    if self.board[idx] != 0:
+                        record.neighbors.append((idx, self.board[idx]))
+            self.apply_self_destruct_damage(coords)
+        # If there's a unit at the destination
+        elif dst_byte != 0:
+            table_idx = _BYTE_TYPE[src_byte] * 5 + _BYTE_TYPE[dst_byte]
+            # If it's an opponent's unit, apply damage to both units
+            if (src_byte ^ dst_byte) & 0x80:
+                damage = min(dst_byte & 0xF, DAMAGE_TABLE[table_idx])
+
+                if _dbg:
+                    print(f"Calculated damage: {damage}")
+
+                # Reduce health of the target unit
+                if _dbg:
+                    print(f"Target unit health before: {dst_byte & 0xF}")
+                self._mod_health_at(record.dst, -damage)
+                if _dbg:
+                    print(f"Target unit after: {self.get(coords.dst)}")
+
+                # Reduce health of the attacking unit
+                if _dbg:
+                    print(f"Moving unit health before: {src_byte & 0xF}")
+                self._mod_health_at(record.src, -damage)
+                if _dbg:
+                    print(f"Moving unit after: {self.get(coords.src)}")
+
+            # If it's a friendly unit, repair if move is valid
             else:
-                # Move the unit to the destination if the target unit is
-                # not alive or if there's no unit at the destination
-                self.set(coords.dst, moving_unit)
-                self.set(coords.src, None)
-
-            return True, ""
+                repair = min(9 - (dst_byte & 0xF), REPAIR_TABLE[table_idx])
+                if _dbg:
+                    print(f"Repair amount: {repair}")
+                    print(f"Target unit health before: {dst_byte & 0xF}")
+                self._mod_health_at(record.dst, +repair)
+                if _dbg:
+                    print(f"Target unit after: {self.get(coords.dst)}")
 
         else:
-            return False, "invalid move"
+            # Move the unit to the destination if the target unit is
+            # not alive or if there's no unit at the destination
+            self._put(record.dst, src_byte)
+            self._put(record.src, 0)
 
     def next_turn(self):
         """Transitions game to the next turn."""
         self.next_player = self.next_player.next()
+        self.hash ^= self.zobrist_side
         self.turns_played += 1
+        self._str_cache = None
+        self._update_terminal()
 
     def to_string(self) -> str:
-        """Pretty text representation of the game."""
-        dim = self.options.dim
-        output = ""
-        output += f"Next player: {self.next_player.name}\n"
-        output += f"Turns played: {self.turns_played}\n"
-        coord = Coord()
-        output += "\n   "
+        """Pretty text representation of the game (cached until the next change to the board or turn)."""
+        if self._str_cache is not None:
+            return self._str_cache
+        dim = self._dim
+        parts = [f"Next player: {self.next_player.name}\n", f"Turns played: {self.turns_played}\n", "\n   "]
         for col in range(dim):
-            coord.col = col
-            label = coord.col_string()
-            output += f"{label:^3} "
-        output += "\n"
+            label = _COL_LABELS[col] if col < 16 else '?'
+            parts.append(f"{label:^3} ")
+        parts.append("\n")
         for row in range(dim):
-            coord.row = row
-            label = coord.row_string()
-            output += f"{label}: "
-            for col in range(dim):
-                coord.col = col
-                unit = self.get(coord)
-                if unit is None:
-                    output += " .  "
-                else:
-                    output += f"{str(unit):^3} "
-            output += "\n"
-        return output
+            label = _ROW_LABELS[row] if row < 26 else '?'
+            parts.append(f"{label}: ")
+            parts.extend(map(_CELL_TEXT.__getitem__, self.board[row * dim:(row + 1) * dim]))
+            parts.append("\n")
+        self._str_cache = "".join(parts)
+        return self._str_cache
 
     def __str__(self) -> str:
         """Default string representation of a game."""
@@ -540,10 +762,8 @@ class Game:
 
     def is_valid_coord(self, coord: Coord) -> bool:
         """Check if a Coord is valid within out board dimensions."""
-        dim = self.options.dim
-        if coord.row < 0 or coord.row >= dim or coord.col < 0 or coord.col >= dim:
-            return False
-        return True
+        dim = self._dim
+        return 0 <= coord.row < dim and 0 <= coord.col < dim
 
     def read_move(self) -> CoordPair:
         """Read a move from keyboard and return as a CoordPair."""
@@ -563,8 +783,7 @@ class Game:
                 mv = self.get_move_from_broker()
                 if mv is not None:
                     (success, result) = self.perform_move(mv)
-                    print(f"Broker {self.next_player.name}: ", end='')
-                    print(result)
+                    sys.stdout.write(f"Broker {self.next_player.name}: {result}\n")
                     if success:
                         self.next_turn()
                         break
@@ -574,8 +793,7 @@ class Game:
                 mv = self.read_move()
                 (success, result) = self.perform_move(mv)
                 if success:
-                    print(f"Player {self.next_player.name}: ", end='')
-                    print(result)
+                    sys.stdout.write(f"Player {self.next_player.name}: {result}\n")
                     self.next_turn()
                     self.game_trace.append(f"turn #{self.turns_played + 1}")
                     self.game_trace.append(f"{self.next_player.name}")
@@ -590,8 +808,7 @@ class Game:
         if mv is not None:
             (success, result) = self.perform_move(mv)
             if success:
-                print(f"Computer {self.next_player.name}: ", end='')
-                print(result)
+                sys.stdout.write(f"Computer {self.next_player.name}: {result}\n")
                 self.next_turn()
                 self.game_trace.append(f"turn #{self.turns_played + 1}")
                 self.game_trace.append(f"{self.next_player.name}")
@@ -600,34 +817,46 @@ class Game:
 
     def player_units(self, player: Player) -> Iterable[Tuple[Coord, Unit]]:
         """Iterates over all units belonging to a player."""
-        for coord in CoordPair.from_dim(self.options.dim).iter_rectangle():
-            unit = self.get(coord)
-            if unit is not None and unit.player == player:
-                yield (coord, unit)
+        dim = self._dim
+        cells = self._bb[player.value]
+        while cells:
+            bit = cells & -cells
+            cells ^= bit
+            idx = bit.bit_length() - 1
+            yield (Coord(idx // dim, idx % dim), self._decode(self.board[idx]))
+
+    def evaluate(self, heuristic_table: list[int]) -> int:
+        """Score the board for the attacker with one of the heuristic_tables, in a single pass over its bytes."""
+        return sum(map(heuristic_table.__getitem__, self.board))
 
     def write_game_trace_to_file(self, filename: str):
-        with open(filename, 'w') as file:
-            for line in self.game_trace:
-                file.write(line + "\n")
+        """Write the game trace, one entry per line, with a single write of the whole text (only the first call)."""
+        if self._trace_written:
+            return
+        self._trace_written = True
+        if not self.game_trace:
+            text = ""
+        else:
+            text = "\n".join(self.game_trace) + "\n"
+        with open(filename, 'w', buffering=1 << 20) as file:
+            file.write(text)
 
 
 
 
     def is_finished(self) -> bool:
         """Check if the game is over."""
-        return self.has_winner() is not None
+        return self._terminal != 0
 
     def has_winner(self) -> Player | None:
-        """Check if the game is over and returns winner"""
-        if self.options.max_turns is not None and self.turns_played >= self.options.max_turns:
-            self.game_trace.append(f"{Player.Defender.name} wins because max turns (100) have passed")
-            return Player.Defender
-        if self._attacker_has_ai:
-            if self._defender_has_ai:
-                return None
-            else:
-                return Player.Attacker
-        return Player.Defender
+        """Check if the game is over and returns winner (does not touch the game trace)."""
+        return _WINNERS[self._terminal]
+
+    def _update_terminal(self):
+        """Recompute the game outcome after an AI was destroyed or a turn was played."""
+        max_turns = self.options.max_turns
+        turns_over = max_turns is not None and self.turns_played >= max_turns
+        self._terminal = _TERMINAL[turns_over][self._attacker_has_ai][self._defender_has_ai]
 
 
 
@@ -635,22 +864,73 @@ class Game:
 
     def move_candidates(self) -> Iterable[CoordPair]:
         """Generate valid move candidates for the next player."""
-        move = CoordPair()
-        for (src, _) in self.player_units(self.next_player):
-            move.src = src
-            for dst in src.iter_adjacent():
-                move.dst = dst
-                if self.is_valid_move(move):
-                    yield move.clone()
-            move.dst = src
-            yield move.clone()
+        for move in self.iter_moves():
+            yield self.move_from_int(move)
+
+    def iter_moves(self) -> Iterable[int]:
+        """Generate valid moves for the next player, encoded as src * dim² + dst cell indices."""
+        cells = self._dim * self._dim
+        (move_masks, _) = self._masks
+        board = self.board
+        player = self.next_player.value
+        # Only the cells the unit type may reach from src are candidates, lowest cell index first
+        owned = self._bb[player]
+        while owned:
+            bit = owned & -owned
+            owned ^= bit
+            src = bit.bit_length() - 1
+            targets = move_masks[_BYTE_TYPE[board[src]]][player][src]
+            while targets:
+                bit = targets & -targets
+                targets ^= bit
+                dst = bit.bit_length() - 1
+                if self.is_legal_move(src, dst):
+                    yield src * cells + dst
+            yield src * cells + src
+
+    def ordered_moves(self, tt_move: int | None = None, killers: Iterable[int | None] = (None, None)) -> list[int]:
+        """Moves from iter_moves, ordered for alpha-beta pruning.
+
+        The transposition table move comes first, then the killer moves, then attacks on the most valuable
+        enemy units with the least valuable units, then the other moves by history score, and last the attacks
+        on units worth less than a sixteenth of the attacker (such as an AI attacking a Firewall).
+        """
+        cells = self._dim * self._dim
+        board = self.board
+        player = self.next_player.value
+        moves = list(self.iter_moves())
+
+        values = self.unit_values
+        killers = tuple(killers)
+        history = self._history[player]
+        # Scales history scores into (-1, 0], between the profitable attacks (at most -1) and the others (above 0)
+        history_scale = -1 / (self._history_max + 1)
+
+        def priority(move: int) -> float:
+            if move == tt_move:
+                return -2000
+            if move in killers:
+                return -1000
+            (src, dst) = divmod(move, cells)
+            target = board[dst]
+            if target == 0 or target >> 7 == player:
+                return history[move] * history_scale
+            return values[_BYTE_TYPE[board[src]]] - 16 * values[_BYTE_TYPE[target]]
+
+        moves.sort(key=priority)
+        return moves
+
+    def move_from_int(self, move: int) -> CoordPair:
+        """Turn a move encoded by iter_moves back into a CoordPair."""
+        dim = self._dim
+        (src, dst) = divmod(move, dim * dim)
+        return CoordPair(Coord(src // dim, src % dim), Coord(dst // dim, dst % dim))
 
     def random_move(self) -> Tuple[int, CoordPair | None, float]:
         """Returns a random move."""
-        move_candidates = list(self.move_candidates())
-        random.shuffle(move_candidates)
-        if len(move_candidates) > 0:
-            return (0, move_candidates[0], 1)
+        moves = list(self.iter_moves())
+        if len(moves) > 0:
+            return (0, self.move_from_int(moves[random.randrange(len(moves))]), 1)
         else:
             return (0, None, 0)
 
@@ -672,127 +952,294 @@ class Game:
         print(f"Elapsed time: {elapsed_seconds:0.1f}s")
         return move
 
+    def alphabeta(self, depth: int, alpha: int, beta: int, maximizing_player: bool,
+                  heuristic_table: list[int], ply: int) -> int:
+        """Minimax value of the game (alpha-beta pruned if enabled), searched in place with do_move/undo_move.
+
+        Scores are heuristic_table evaluations, so the attacker is the maximizing player. ply is the number of moves
+        from the root of the search, which keys the evaluation stats.
+        """
+        if depth == 0 or self.is_finished():
+            return self.evaluate(heuristic_table)
+
+        # A stored result searched at least as deep either settles the node or narrows the window. The hash leaves
+        # out the turn count, so scores are only shared by searches that can't reach max_turns
+        tt = self._tt
+        entry = tt.get(self.hash)
+        max_turns = self.options.max_turns
+        scores_in_tt = max_turns is None or self.turns_played + depth < max_turns
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[3]
+        if entry is not None and entry[0] >= depth and scores_in_tt:
+            (_, score, flag, _) = entry
+            if flag == TT_EXACT:
+                return score
+            if flag == TT_LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if beta <= alpha and self.options.alpha_beta:
+                return score
+        alpha_orig, beta_orig = alpha, beta
+        moves = self.ordered_moves(tt_move, self._killers[ply])
+        if self._deadline is not None:
+            self._nodes_to_check -= len(moves)
+            if self._nodes_to_check <= 0:
+                self._nodes_to_check = TIME_CHECK_NODES
+                if monotonic() > self._deadline:
+                    raise SearchTimeout()
+
+        # The loops below run for every node of the tree, so bound what they use to locals; children at depth 0
+        # are evaluated right here rather than through another call
+        alpha_beta = self.options.alpha_beta
+        evaluations_per_depth = self.stats.evaluations_per_depth
+        do_move = self.do_move
+        undo_move = self.undo_move
+        leaf = depth == 1
+        # Only one move is played at a time at each depth, so its undo record can be reused
+        record = self._records[depth]
+
+        best_move = None
+        searched = 0
+        if maximizing_player:
+            best_eval = MIN_HEURISTIC_SCORE
+            for move in moves:
+                searched += 1
+                do_move(move, record)
+                try:
+                    if leaf:
+                        eval = self.evaluate(heuristic_table)
+                    else:
+                        eval = self.alphabeta(depth - 1, alpha, beta, False, heuristic_table, ply + 1)
+                finally:
+                    undo_move(record)
+                if eval > best_eval:
+                    best_eval = eval
+                    best_move = move
+                alpha = max(alpha, eval)
+                if beta <= alpha and alpha_beta:
+                    self.add_killer(ply, depth, move)
+                    break
+        else:
+            best_eval = MAX_HEURISTIC_SCORE
+            for move in moves:
+                searched += 1
+                do_move(move, record)
+                try:
+                    if leaf:
+                        eval = self.evaluate(heuristic_table)
+                    else:
+                        eval = self.alphabeta(depth - 1, alpha, beta, True, heuristic_table, ply + 1)
+                finally:
+                    undo_move(record)
+                if eval < best_eval:
+                    best_eval = eval
+                    best_move = move
+                beta = min(beta, eval)
+                if beta <= alpha and alpha_beta:
+                    self.add_killer(ply, depth, move)
+                    break
+
+        evaluations_per_depth[ply] = evaluations_per_depth.get(ply, 0) + searched
+        if leaf:
+            self.stats.leaf_evaluations += searched
+
+        # An empty window cuts off after the first child, so the score is not a bound that can be stored
+        if not scores_in_tt or alpha_orig >= beta_orig:
+            return best_eval
+        if best_eval <= alpha_orig:
+            flag = TT_UPPER
+        elif best_eval >= beta_orig:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        # Depth-preferred replacement: a position keeps its deepest result. A full table is emptied, since
+        # removing the oldest entry one store at a time makes the dict scan ever more deleted slots
+        entry = tt.get(self.hash)
+        if entry is None:
+            if len(tt) >= self.options.tt_size:
+                tt.clear()
+        elif entry[0] > depth:
+            return best_eval
+        tt[self.hash] = (depth, best_eval, flag, best_move)
+        return best_eval
+
+    def add_killer(self, ply: int, depth: int, move: int):
+        """Remember a quiet move that caused a cutoff, to try it early at the same ply and raise its history score."""
+        cells = self._dim * self._dim
+        if self.board[move % cells] != 0:
+            return
+        killers = self._killers[ply]
+        if move != killers[0]:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self._history[self.next_player.value]
+        history[move] += depth * depth
+        if history[move] > self._history_max:
+            self._history_max = history[move]
+
+    def reset_move_ordering(self):
+        """Forget the killer moves and history scores, sized for a search up to options.max_depth."""
+        cells = self._dim * self._dim
+        self._killers = [[None, None] for _ in range(self.options.max_depth + 1)]
+        self._history = [[0] * (cells * cells) for _ in Player]
+        self._history_max = 0
+
+    def reserve_undo_records(self):
+        """Make sure alphabeta has an undo record to reuse at every search depth up to options.max_depth."""
+        while len(self._records) <= self.options.max_depth:
+            self._records.append(UndoRecord())
+
     def suggest_move(self) -> CoordPair | None:
-        """Suggest the next move using minimax alpha beta with the provided heuristic."""
-        start_time = datetime.now()
+        """Suggest the next move using minimax alpha beta with the provided heuristic.
 
-        def evaluate_position_0(game):
-            # Heuristic function based on the provided formula
-            attacker = Player.Attacker
-            defender = Player.Defender
-
-            VP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.Virus)
-            TP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.Tech)
-            FP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.Firewall)
-            PP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.Program)
-            AIP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.AI)
-
-            VP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.Virus)
-            TP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.Tech)
-            FP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.Firewall)
-            PP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.Program)
-            AIP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.AI)
-
-            return (3 * VP1 + 3 * TP1 + 3 * FP1 + 3 * PP1 + 9999 * AIP1) - (
-                        3 * VP2 + 3 * TP2 + 3 * FP2 + 3 * PP2 + 9999 * AIP2)
-
-        def evaluate_position_1(game):
-            attacker = Player.Attacker
-            defender = Player.Defender
-
-            VP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.Virus)
-            TP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.Tech)
-            FP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.Firewall)
-            PP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.Program)
-            AIP1 = sum(1 for _, unit in game.player_units(attacker) if unit.type == UnitType.AI)
-
-            VP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.Virus)
-            TP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.Tech)
-            FP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.Firewall)
-            PP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.Program)
-            AIP2 = sum(1 for _, unit in game.player_units(defender) if unit.type == UnitType.AI)
-
-            return (9 * VP1 + 1 * TP1 + 1 * FP1 + 3 * PP1 + 9999 * AIP1) - (
-                    9 * VP2 + 1 * TP2 + 1 * FP2 + 3 * PP2 + 9999 * AIP2)
-
-        def evaluate_position_2(game):
-            attacker = Player.Attacker
-            defender = Player.Defender
-
-            VP1 = sum(unit.health for _, unit in game.player_units(attacker) if unit.type == UnitType.Virus)
-            TP1 = sum(unit.health for _, unit in game.player_units(attacker) if unit.type == UnitType.Tech)
-            FP1 = sum(unit.health for _, unit in game.player_units(attacker) if unit.type == UnitType.Firewall)
-            PP1 = sum(unit.health for _, unit in game.player_units(attacker) if unit.type == UnitType.Program)
-            AIP1 = sum(unit.health for _, unit in game.player_units(attacker) if unit.type == UnitType.AI)
-
-            VP2 = sum(unit.health for _, unit in game.player_units(defender) if unit.type == UnitType.Virus)
-            TP2 = sum(unit.health for _, unit in game.player_units(defender) if unit.type == UnitType.Tech)
-            FP2 = sum(unit.health for _, unit in game.player_units(defender) if unit.type == UnitType.Firewall)
-            PP2 = sum(unit.health for _, unit in game.player_units(defender) if unit.type == UnitType.Program)
-            AIP2 = sum(unit.health for _, unit in game.player_units(defender) if unit.type == UnitType.AI)
-
-            return (9 * VP1 + 1 * TP1 + 1 * FP1 + 3 * PP1 + 9999 * AIP1) - (
-                    9 * VP2 + 1 * TP2 + 1 * FP2 + 3 * PP2 + 9999 * AIP2)
-
-        def minimax(node, depth, maximizing_player, alpha, beta):
-            if depth == 0 or node.is_finished():
-                if self.options.heuristic == 0:
-                    return evaluate_position_0(node)
-                if self.options.heuristic == 1:
-                    return evaluate_position_1(node)
-                return evaluate_position_2(node)
+        Searches with iterative deepening up to max_depth, each iteration starting from the previous best move
+        within an aspiration window around the previous score. Once depth 1 is done, the search stops when
+        TIME_BUDGET_SHARE of max_time runs out and plays the best move of the deepest completed iteration.
+        """
+        start_time = datetime.now()
+        start = monotonic()
 
-            if maximizing_player:
-                max_eval = float('-inf')
-                for move in node.move_candidates():
-                    child_node = node.clone()
-                    self.stats.evaluations_per_depth[depth] = self.stats.evaluations_per_depth.get(depth, 0)+1
-                    child_node.perform_move(move)
-                    eval = minimax(child_node, depth - 1, False, alpha, beta)
-                    max_eval = max(max_eval, eval)
-                    alpha = max(alpha, eval)
-                    if beta <= alpha and self.options.alpha_beta:
-                        break
-                return max_eval
-            else:
-                min_eval = float('inf')
-                for move in node.move_candidates():
-                    child_node = node.clone()
-                    self.stats.evaluations_per_depth[depth] = self.stats.evaluations_per_depth.get(depth, 0)+1
-
-                    child_node.perform_move(move)
-                    eval = minimax(child_node, depth - 1, True, alpha, beta)
-                    min_eval = min(min_eval, eval)
-                    beta = min(beta, eval)
-                    if beta <= alpha and self.options.alpha_beta:
-                        break
-                return min_eval
+        heuristic_table = self.heuristic_tables[self.options.heuristic if self.options.heuristic in (0, 1) else 2]
 
+        # Heuristics score the position for the attacker, so the defender looks for the lowest score
+        maximizing_player = self.next_player == Player.Attacker
+        search = self.search_root_parallel if self.options.parallel else self.search_root
         best_move = None
-        best_value = float('-inf')
-        depth = self.options.max_depth
-
-        for move in self.move_candidates():
-            child_node = self.clone()
-            child_node.perform_move(move)
-            eval = minimax(child_node, depth - 1, False, float('-inf'), float('inf'))
-            if eval > best_value:
-                best_value = eval
-                best_move = move
+        best_value = None
+        depth_reached = 0
+        self.reset_move_ordering()
+        self.reserve_undo_records()
+        self._deadline = None
+        self._nodes_to_check = TIME_CHECK_NODES
+
+        entry = self._tt.get(self.hash)
+        hint = None if entry is None else entry[3]
+        if self.options.parallel:
+            self.warm_up()
+        try:
+            for depth in range(1, self.options.max_depth + 1):
+                if self._deadline is not None and monotonic() > self._deadline:
+                    break
+                moves = self.ordered_moves(hint)
+                if len(moves) == 0:
+                    break
+                try:
+                    if best_value is None or not self.options.alpha_beta:
+                        (value, move) = search(moves, depth, MIN_HEURISTIC_SCORE, MAX_HEURISTIC_SCORE,
+                                               maximizing_player, heuristic_table)
+                    else:
+                        (alpha, beta) = (best_value - ASPIRATION_WINDOW, best_value + ASPIRATION_WINDOW)
+                        (value, move) = search(moves, depth, alpha, beta, maximizing_player, heuristic_table)
+                        if value <= alpha or value >= beta:
+                            (value, move) = search(moves, depth, MIN_HEURISTIC_SCORE, MAX_HEURISTIC_SCORE,
+                                                   maximizing_player, heuristic_table)
+                except SearchTimeout:
+                    break
+                (best_value, best_move, hint) = (value, move, move)
+                depth_reached = depth
+                if self.options.max_time is not None:
+                    self._deadline = start + self.options.max_time * TIME_BUDGET_SHARE
+        finally:
+            self._deadline = None
 
         elapsed_seconds = (datetime.now() - start_time).total_seconds()
         self.stats.total_seconds += elapsed_seconds
 
         if best_move is not None:
-            print(f"Heuristic score: {best_value}")
-            print(f"Elapsed time: {elapsed_seconds:0.2f}s")
+            sys.stdout.write(f"Heuristic score: {best_value}\nSearch depth: {depth_reached}\n"
+                             f"Elapsed time: {elapsed_seconds:0.2f}s\n")
             self.game_trace.append(f"Heuristic score: {best_value}")
             self.game_trace.append(f"Elapsed time: {elapsed_seconds:0.2f}s")
 
-            return best_move
+            return self.move_from_int(best_move)
         else:
             return None
 
+    def search_root(self, moves: list[int], depth: int, alpha: int, beta: int, maximizing_player: bool,
+                    heuristic_table: list[int]) -> Tuple[int, int | None]:
+        """Search the root moves within an (alpha, beta) window and return the best (score, move)."""
+        best_move = None
+        best_value = MIN_HEURISTIC_SCORE if maximizing_player else MAX_HEURISTIC_SCORE
+        for move in moves:
+            record = self.do_move(move)
+            try:
+                value = self.alphabeta(depth - 1, alpha, beta, not maximizing_player, heuristic_table, 1)
+            finally:
+                self.undo_move(record)
+            if (value > best_value) if maximizing_player else (value < best_value):
+                best_value = value
+                best_move = move
+            if maximizing_player:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if beta <= alpha and self.options.alpha_beta:
+                break
+        return (best_value, best_move)
+
+    def search_root_parallel(self, moves: list[int], depth: int, alpha: int, beta: int, maximizing_player: bool,
+                             heuristic_table: list[int]) -> Tuple[int, int | None]:
+        """Score root moves in worker processes and return the best (score, move).
+
+        The first move is searched here to narrow the window, the others are searched in parallel within it.
+        """
+        if len(moves) == 1:
+            return self.search_root(moves, depth, alpha, beta, maximizing_player, heuristic_table)
+        (best_value, best_move) = self.search_root(moves[:1], depth, alpha, beta, maximizing_player, heuristic_table)
+        if maximizing_player:
+            alpha = max(alpha, best_value)
+        else:
+            beta = min(beta, best_value)
+        # A first move that fails high settles the window: the workers would only be handed an empty one
+        if beta <= alpha and self.options.alpha_beta:
+            return (best_value, best_move)
+
+        position = (bytes(self.board), self.next_player, self.turns_played)
+        futures = {self._pool.submit(search_root_move, position, move, depth, alpha, beta, heuristic_table,
+                                     self._deadline): i
+                   for (i, move) in enumerate(moves) if i > 0}
+        best_index = 0
+        for future in as_completed(futures):
+            try:
+                (value, stats) = future.result()
+            except SearchTimeout:
+                # Drop the moves not started yet so they don't hold up the workers on the next turn
+                for pending in futures:
+                    pending.cancel()
+                raise
+            for (ply, n) in stats.evaluations_per_depth.items():
+                self.stats.evaluations_per_depth[ply] = self.stats.evaluations_per_depth.get(ply, 0) + n
+            self.stats.leaf_evaluations += stats.leaf_evaluations
+            # On equal scores keep the earliest move, as the sequential search does
+            i = futures[future]
+            if ((value > best_value) if maximizing_player else (value < best_value)) or \
+                    (value == best_value and i < best_index):
+                (best_value, best_move, best_index) = (value, moves[i], i)
+        return (best_value, best_move)
+
+    def warm_up(self):
+        """Start the worker processes of search_root_parallel, if not started yet, and wait until they are ready.
+
+        They are kept for the whole game, so only the first computer turn would otherwise pay for starting them.
+        """
+        if self._pool is not None:
+            return
+        # Workers get a copy without the transposition table, trace and broker session, which would be costly to send
+        root = self.clone()
+        root._tt = {}
+        root.game_trace = []
+        root.stats = Stats()
+        root._http = None
+        root._pool = None
+        root.reset_move_ordering()
+        root.reserve_undo_records()
+        workers = os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=init_search_worker, initargs=(root,))
+        for future in [self._pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+
     def post_move_to_broker(self, move: CoordPair):
         """Send a move to the game broker."""
         if self.options.broker is None:
@@ -803,7 +1250,7 @@ class Game:
             "turn": self.turns_played
         }
         try:
-            r = requests.post(self.options.broker, json=data)
+            r = self._http.post(self.options.broker, json=data)
             if r.status_code == 200 and r.json()['success'] and r.json()['data'] == data:
                 # print(f"Sent move to broker: {move}")
                 pass
@@ -816,9 +1263,8 @@ class Game:
         """Get a move from the game broker."""
         if self.options.broker is None:
             return None
-        headers = {'Accept': 'application/json'}
         try:
-            r = requests.get(self.options.broker, headers=headers)
+            r = self._http.get(self.options.broker)
             if r.status_code == 200 and r.json()['success']:
                 data = r.json()['data']
                 if data is not None:
@@ -843,6 +1289,41 @@ class Game:
         return None
 
 
+##############################################################################################################
+
+# game searched by this worker process of Game.warm_up
+_worker_game: Game | None = None
+
+
+def init_search_worker(game: Game):
+    """Keep the game sent by Game.warm_up in this worker process."""
+    global _worker_game
+    _worker_game = game
+
+
+def search_root_move(position: Tuple[bytes, Player, int], move: int, depth: int, alpha: int, beta: int,
+                     heuristic_table: list[int], deadline: float | None) -> Tuple[int, Stats]:
+    """Score one root move in a worker process for Game.search_root_parallel; also returns the search's stats.
+
+    position is the (board, next player, turns played) of the root. The worker's transposition table carries over
+    from one root move, iteration and turn to the next, while its killer moves and history scores start over with
+    each new root position, as they do for the sequential search in suggest_move.
+    """
+    game = _worker_game
+    (board, next_player, turns_played) = position
+    if game.board != board or game.next_player != next_player or game.turns_played != turns_played:
+        game.set_position(board, next_player, turns_played)
+        game.reset_move_ordering()
+    game.stats = Stats()
+    game._deadline = deadline
+    record = game.do_move(move)
+    try:
+        value = game.alphabeta(depth - 1, alpha, beta, game.next_player == Player.Attacker, heuristic_table, 1)
+    finally:
+        game.undo_move(record)
+    return (value, game.stats)
+
+
 ##############################################################################################################
 
 def main():
@@ -857,6 +1338,8 @@ def main():
     parser.add_argument('--broker', type=str, help='play via a game broker')
     parser.add_argument('--alpha_beta', type=bool, default=False, help='use alpha-beta pruning')
     parser.add_argument('--heuristic', type=int, default=0, help='heuristic function: 0|1|2')
+    parser.add_argument('--parallel', action='store_true', help='search root moves in parallel processes')
+    parser.add_argument('--debug', action='store_true', help='print the details of every move played')
 
     args = parser.parse_args()
 
@@ -893,51 +1376,69 @@ def main():
         options.alpha_beta = args.alpha_beta
     if args.heuristic is not None:
         options.heuristic = args.heuristic
+    options.parallel = args.parallel
+    options.debug = args.debug
     # create a new game
     game = Game(options=options)
+    if options.parallel:
+        game.warm_up()
+
+    # the trace is written however the game ends: normally, on an error, Ctrl-C or any exit
+    atexit.register(game.write_game_trace_to_file, file_name)
+
+    # options read on every turn, fetched once: the players moved by hand and the turn limit
+    human_players = {
+        GameType.AttackerVsDefender: (Player.Attacker, Player.Defender),
+        GameType.AttackerVsComp: (Player.Attacker,),
+        GameType.CompVsDefender: (Player.Defender,),
+    }.get(game.options.game_type, ())
+    max_turns = game.options.max_turns
 
     # the main game loop
-    while True:
-        print()
-        print(game)
-        game.game_trace.append("New board configuration:")
-        game.game_trace.append(game.to_string())
-        winner = game.has_winner()
-        if winner is not None:
-            print(f"{winner.name} wins!\nGame Over!!")
-            game.game_trace.append(f"{winner.name} wins in {game.turns_played} turns")
-            break
-        if game.options.game_type == GameType.AttackerVsDefender:
-            game.human_turn()
-        elif game.options.game_type == GameType.AttackerVsComp and game.next_player == Player.Attacker:
-            game.human_turn()
-        elif game.options.game_type == GameType.CompVsDefender and game.next_player == Player.Defender:
-            game.human_turn()
-        else:
-            player = game.next_player
-            move = game.computer_turn()
-            if move is not None:
-                game.post_move_to_broker(move)
+    try:
+        while True:
+            sys.stdout.write(f"\n{game}\n")
+            game.game_trace.append("New board configuration:")
+            game.game_trace.append(game.to_string())
+            winner = game.has_winner()
+            if winner is not None:
+                sys.stdout.write(f"{winner.name} wins!\nGame Over!!\n")
+                if max_turns is not None and game.turns_played >= max_turns:
+                    game.game_trace.append(f"{Player.Defender.name} wins because max turns (100) have passed")
+                game.game_trace.append(f"{winner.name} wins in {game.turns_played} turns")
+                break
+            if game.next_player in human_players:
+                game.human_turn()
+            else:
+                move = game.computer_turn()
+                if move is not None:
+                    game.post_move_to_broker(move)
+                else:
+                    sys.stdout.write("Computer doesn't know what to do!!!\n")
+                    raise SystemExit(1)
+        game.game_trace.append("Cumulative evals: ")
+        total_evals = 0
+        for v in game.stats.evaluations_per_depth.values():
+            total_evals = total_evals+v
+        game.game_trace.append(str(total_evals))
+
+        game.game_trace.append("Cumulative evals by depth: ")
+        for k in sorted(game.stats.evaluations_per_depth.keys()):
+            game.game_trace.append(f"{k}:{game.stats.evaluations_per_depth[k]}")
+        game.game_trace.append("Cumulative % evals by depth: ")
+        for k in sorted(game.stats.evaluations_per_depth.keys()):
+            if total_evals > 0:
+                game.game_trace.append(f"{k}:{game.stats.evaluations_per_depth[k]/total_evals*100:0.2f}%")
             else:
-                print("Computer doesn't know what to do!!!")
-                exit(1)
-    game.game_trace.append("Cumulative evals: ")
-    total_evals = 0
-    for v in game.stats.evaluations_per_depth.values():
-        total_evals = total_evals+v
-    game.game_trace.append(str(total_evals))
-
-    game.game_trace.append("Cumulative evals by depth: ")
-    for k in sorted(game.stats.evaluations_per_depth.keys()):
-        game.game_trace.append(f"{game.options.max_depth-k}:{game.stats.evaluations_per_depth[k]}")
-    game.game_trace.append("Cumulative % evals by depth: ")
-    for k in sorted(game.stats.evaluations_per_depth.keys()):
-        game.game_trace.append(f"{game.options.max_depth-k}:{game.stats.evaluations_per_depth[k]/total_evals*100:0.2f}%")
-    treesize = total_evals
-    nonleaf_nodes = total_evals-game.stats.evaluations_per_depth[1]
-    game.game_trace.append(f"Average Branching factor:{treesize/nonleaf_nodes:0.2f}")
-
-    game.write_game_trace_to_file(file_name)
+                game.game_trace.append(f"{k}:n/a")
+        treesize = total_evals
+        nonleaf_nodes = total_evals-game.stats.leaf_evaluations
+        if nonleaf_nodes > 0:
+            game.game_trace.append(f"Average Branching factor:{treesize/nonleaf_nodes:0.2f}")
+        else:
+            game.game_trace.append("Average Branching factor:n/a")
+    finally:
+        game.write_game_trace_to_file(file_name)
 
 
 